@@ -7,12 +7,12 @@
 """
 
 import csv
+import re
 import sys
-from functools import cached_property
+from collections.abc import KeysView
 from pathlib import Path
 
-import validators
-from public_domain import Domain, parse_files
+from public_domain import Domain
 
 nb_errors = 0
 
@@ -29,80 +29,113 @@ def warn(*args, **kwargs):
     print(*args, **kwargs)
 
 
-def check_is_valid_domain(file, lineno, line):
-    if not validators.domain(line, rfc_2782=True):
-        err(f"{file}:{lineno}: {line!r} does not looks like a domain name.")
-    if not validators.domain(line):
+def _domain_regex(service_record=""):
+    """Same grammar as validators.domain, compiled once instead of per call."""
+    return re.compile(
+        rf"^(?:[a-z0-9{service_record}]"
+        rf"(?:[a-z0-9-{service_record}]{{0,61}}"
+        rf"[a-z0-9{service_record}])?\.)"
+        r"+[a-z0-9][a-z0-9-_]{0,61}"
+        r"[a-z]$",
+        re.IGNORECASE,
+    )
+
+
+DOMAIN = _domain_regex()
+SRV_DOMAIN = _domain_regex(service_record="_")  # RFC 2782 allows underscores.
+FORBIDDEN = re.compile(r"\s|__+")
+
+
+def to_ascii(name):
+    """IDNA-encode the given name, or return None if it can't be a domain."""
+    if not name or FORBIDDEN.search(name):
+        return None
+    if name.isascii():
+        # Nothing for IDNA to encode, and the label lengths it would
+        # check are enforced by the DOMAIN regexes anyway.
+        return name
+    try:
+        return name.encode("idna").decode("utf-8")
+    except UnicodeError:
+        return None
+
+
+def check_is_valid_domain(file, lineno, domain):
+    name = to_ascii(domain.name)
+    if name is None or not SRV_DOMAIN.match(name):
+        err(f"{file}:{lineno}: {domain.name!r} does not looks like a domain name.")
+    if name is None or not DOMAIN.match(name):
         warn(
-            f"{file}:{lineno}: {line!r} cannot be used in an URL,",
+            f"{file}:{lineno}: {domain.name!r} cannot be used in an URL,",
             "it's either an DNS SRV record or a typo.",
         )
 
 
-def check_lowercased(file, lineno, line):
-    if line != line.lower():
-        err(f"{file}:{lineno}: {line!r} is not lowercased.")
+def check_lowercased(file, lineno, domain):
+    if domain.name != domain.name.lower():
+        err(f"{file}:{lineno}: {domain.name!r} is not lowercased.")
 
 
-def check_is_public_domain(file, lineno, line):
-    if Domain.from_file_line(file, line).is_not_public():
-        err(f"{file}:{lineno}: {line!r} is not a public domain.")
+def check_is_public_domain(file, lineno, domain):
+    if domain.is_not_public():
+        err(f"{file}:{lineno}: {domain.name!r} is not a public domain.")
 
 
 class SortedChecker:
     def __init__(self):
-        self.previous = None
+        self.previous: Domain | None = None
         self.has_errored = False
 
     def __call__(self, file, lineno, domain):
         if self.has_errored:
             return  # Don't flood
         if self.previous is not None:
-            if self.previous > Domain.from_file_line(file, domain):
+            if self.previous > domain:
                 err(f"{file}: Is not sorted, run `python scripts/sort.py domains.csv`")
                 self.has_errored = True
-        self.previous = Domain.from_file_line(file, domain)
+        self.previous = domain
 
 
 class DuplicateChecker:
     def __init__(self):
-        self.seen = {}
+        self.seen: dict[str, tuple[str, int]] = {}
 
-    def check_if_already_seen(self, file, lineno, domain):
-        """Checks if the given domain has already been seen."""
-        if domain in self.seen:
-            seen_in_file, seen_at_line = self.seen[domain]
+    def check_if_already_seen(self, file, lineno, name):
+        """Checks if the given domain name has already been seen."""
+        if name in self.seen:
+            seen_in_file, seen_at_line = self.seen[name]
             err(
-                f"{file}:{lineno}: Duplicate domain {domain!r} "
+                f"{file}:{lineno}: Duplicate domain {name!r} "
                 f"(already seen in {seen_in_file}:{seen_at_line})"
             )
 
-    def check_if_seen_in_other_file(self, file, lineno, domain):
+    def check_if_seen_in_other_file(self, file, lineno, name):
         """Called twice, checks either we've seen the same domain with or without 'www.'
         in another file.
 
         As both (www and non-www) should probably lie in the same file.
         """
-        if domain not in self.seen:
+        if name not in self.seen:
             return
-        seen_in_file, seen_at_line = self.seen[Domain.from_file_line(file, domain)]
+        seen_in_file, seen_at_line = self.seen[name]
         if seen_in_file != file:
             err(
-                f"{file}:{lineno}: Domain {domain} and its www-prefixed counterpart "
+                f"{file}:{lineno}: Domain {name} and its www-prefixed counterpart "
                 "should reside in the same file, the other one is in "
                 f"{seen_in_file}:{seen_at_line}"
             )
 
-    def __call__(self, file, lineno, line):
-        self.check_if_already_seen(file, lineno, line)
-        self.check_if_seen_in_other_file(file, lineno, "www." + line)
-        if line.startswith("www."):
-            self.check_if_seen_in_other_file(file, lineno, line[4:])
-        self.seen[Domain.from_file_line(file, line)] = (file, lineno)
+    def __call__(self, file, lineno, domain):
+        name = sys.intern(domain.name)
+        self.check_if_already_seen(file, lineno, name)
+        self.check_if_seen_in_other_file(file, lineno, "www." + name)
+        if name.startswith("www."):
+            self.check_if_seen_in_other_file(file, lineno, name[4:])
+        self.seen[name] = (file, lineno)
 
-    @cached_property
-    def all_domains(self) -> set[Domain]:
-        return set(self.seen.keys())
+    @property
+    def all_domains(self) -> KeysView[str]:
+        return self.seen.keys()
 
 
 def main():
@@ -116,15 +149,25 @@ def main():
     ]
 
     with open("domains.csv", encoding="UTF-8") as domainsfile:
+        # Not a plain split on lines: some *_status cells are quoted and span
+        # multiple lines, csv.reader handles them and keeps line_num accurate.
         domainsreader = csv.reader(domainsfile)
         next(domainsreader)  # Skip header
 
         for line in domainsreader:
+            domain = Domain(line[0])
+            lineno = domainsreader.line_num
             for checker in checkers:
-                checker("domains.csv", domainsreader.line_num, line[0])
-
-    for domain in parse_files(Path("urls.txt")) - check_duplicate_line.all_domains:
-        err(f"urls.txt: {domain} not found in domains.csv.")
+                checker("domains.csv", lineno, domain)
+
+    urls_txt = Path("urls.txt")
+    with open(urls_txt, encoding="UTF-8") as urlsfile:
+        for line in urlsfile:
+            if line.startswith("#"):
+                continue
+            domain = Domain.from_file_line(urls_txt, line)
+            if domain.name not in check_duplicate_line.all_domains:
+                err(f"urls.txt: {domain} not found in domains.csv.")
 
 
 if __name__ == "__main__":
@@ -2,7 +2,7 @@
 # (behind redirections or in TLS certificates alt names)
 # that are **not** from the french public sector.
 
-NON_PUBLIC_DOMAINS = {
+NON_PUBLIC_DOMAINS = frozenset({
     "128k.io",
     "3dathome.fr",
     "attichy.com",
@@ -82,4 +82,4 @@ NON_PUBLIC_DOMAINS = {
     "vitry-sur-orne.com",  # domaine squatté
     "voxaly.com",
     "wewmanager.com",
-}
+})
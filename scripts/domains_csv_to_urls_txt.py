@@ -1,6 +1,8 @@
 from pathlib import Path
 
-from public_domain import parse_csv_file
+from public_domain import parse_csv_file, sort_domains
+
+ROOT = Path(__file__).resolve().parent.parent
 
 
 def is_interesting_domain(domain):
@@ -9,13 +11,16 @@ def is_interesting_domain(domain):
     )
 
 
+def write_urls_txt(domains, urls_txt=ROOT / "urls.txt"):
+    """Write the URLs of the domains replying 200 OK, for callers having
+    domains.csv already parsed."""
+    interesting = [domain for domain in domains if is_interesting_domain(domain)]
+    with open(urls_txt, "w", encoding="UTF-8") as f:
+        f.writelines(domain.url + "\n" for domain in sort_domains(interesting))
+
+
 def main():
-    repo_root = Path(__file__).parent.parent
-    urls_txt = repo_root / "urls.txt"
-    domains_csv = repo_root / "domains.csv"
-    domains = parse_csv_file(domains_csv)
-    urls = [domain.url for domain in sorted(domains) if is_interesting_domain(domain)]
-    urls_txt.write_text("\n".join(urls) + "\n", encoding="UTF-8")
+    write_urls_txt(parse_csv_file(ROOT / "domains.csv"))
 
 
 if __name__ == "__main__":
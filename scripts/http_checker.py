@@ -3,23 +3,35 @@
 import argparse
 import asyncio
 import logging
+import random
 import re
 from binascii import crc32
+from itertools import islice
 from pathlib import Path
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urljoin, urlsplit
 
 import aiohttp
 from tqdm.asyncio import tqdm
 
+try:
+    from uvloop import run  # A faster event loop, if installed.
+except ImportError:
+    from asyncio import run
+
 import domains_csv_to_urls_txt
 from public_domain import Domain, parse_csv_file, write_csv_file
 
+ROOT = Path(__file__).resolve().parent.parent
+
 USER_AGENT = "See https://github.com/etalab/noms-de-domaine-organismes-publics"
 
 HEADERS = {"User-Agent": USER_AGENT}
 
 logger = logging.getLogger("http_checker")
 
+PARENTHESED = re.compile(r"\([^\)]*\)")
+BRACKETED = re.compile(r"\[[^\]]*\]")
+
 
 def avoid_surrogates(s):
     """Drop surrogates from the given string.
@@ -41,6 +53,9 @@ def to_message(err):
             return f"{err.status} {avoid_surrogates(err.reason)} {dest}"
         case aiohttp.ServerDisconnectedError():
             return "Server disconnected"
+        case asyncio.TimeoutError():
+            # Before ClientError: sock_connect and sock_read timeouts are both.
+            return "Timeout"
         case aiohttp.client_exceptions.ClientResponseError():
             return f"{err.status} {avoid_surrogates(err.message)}"
         case aiohttp.client_exceptions.ClientError():
@@ -48,16 +63,16 @@ def to_message(err):
                 err = err.certificate_error
             if hasattr(err, "strerror") and err.strerror is not None:
                 err = err.strerror
-            err = re.sub(r"\([^\)]*\)", "", str(err))  # Remove parenthesed details
-            err = re.sub(r"\[[^\]]*\]", "", err)  # Remove bracketed details
-            err = err.split(":")[0].strip()
-            if "Cannot connect to host" in str(err):
+            err = PARENTHESED.sub("", str(err))  # Remove parenthesed details
+            err = BRACKETED.sub("", err)  # Remove bracketed details
+            # Looked up before dropping what follows ":", as hosts resolving
+            # to multiple addresses give "Multiple exceptions: [Errno 111]
+            # Connect call failed (...), [Errno 111] Connect call failed (...)"
+            if "Cannot connect to host" in err:
                 return "Cannot connect"
-            if "Connect call failed" in str(err):
+            if "Connect call failed" in err:
                 return "Connection failed"
-            return err
-        case asyncio.TimeoutError():
-            return "Timeout"
+            return err.split(":")[0].strip()
         case aiohttp.ClientResponse():
             return f"{err.status} {avoid_surrogates(err.reason)}"
         case _:
@@ -65,7 +80,9 @@ def to_message(err):
 
 
 def share_same_domain(url1: str, url2: str):
-    return urlparse(url1).netloc == urlparse(url2).netloc
+    # urlsplit is memoized by the stdlib, and urljoin just split the same
+    # URLs: unlike urlparse, no ;params parsing is done on top of it.
+    return urlsplit(url1).netloc == urlsplit(url2).netloc
 
 
 async def http_head(
@@ -85,7 +102,7 @@ async def http_head(
     ) as response:
         logger.info("%s: %s %s", url, response.status, response.reason)
     if response.status == 405 and method == "HEAD":  # Method Not Allowed
-        return await http_head(url, client, method="GET")
+        return await http_head(url, client, max_redirects, method="GET")
     if (
             300 < response.status < 400
             and "Location" in response.headers
@@ -96,6 +113,24 @@ async def http_head(
     return response
 
 
+async def http_head_with_retries(
+        url: str, client: aiohttp.ClientSession, retries=2
+) -> aiohttp.ClientResponse:
+    """http_head, retried with exponential backoff when the server hangs up.
+
+    Other errors (timeouts, refused connections, DNS, TLS) are unlikely
+    to go away within a second so they are not retried.
+    """
+    for attempt in range(retries):
+        try:
+            return await http_head(url, client=client)
+        except aiohttp.ServerDisconnectedError:
+            delay = 0.5 * 2**attempt + random.uniform(0, 0.25)
+            logger.debug("%s: Server disconnected, retrying in %.2fs", url, delay)
+            await asyncio.sleep(delay)
+    return await http_head(url, client=client)
+
+
 async def check_domain(
         domain: Domain,
         client: aiohttp.ClientSession,
@@ -105,12 +140,16 @@ async def check_domain(
         try:
             url = f"{protocol}://{domain.name}"
             logger.debug("%s: Querying...", url)
-            response = await http_head(url, client=client)
+            response = await http_head_with_retries(url, client=client)
             domain.set_status(protocol, to_message(response))
         except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as err:
             message = to_message(err)
             domain.set_status(protocol, message)
             logger.info("%s: KO: %s", url, message)
+            if protocol == "https" and isinstance(err, aiohttp.ClientConnectorDNSError):
+                # Failed lookups are not cached, http:// would fail the same way.
+                domain.set_status("http", message)
+                return
 
 
 def parse_args():
@@ -125,12 +164,11 @@ def parse_args():
         return left, right
 
     parser = argparse.ArgumentParser()
-    project_root = Path(__file__).parent.parent
     parser.add_argument(
         "--file",
         type=Path,
         help="CSV file containing the domain list to check.",
-        default=project_root / "domains.csv",
+        default=ROOT / "domains.csv",
     )
     parser.add_argument(
         "--slow",
@@ -190,15 +228,32 @@ def parse_args():
 async def rescan_domains(
         to_check: list[Domain], kindness: int = 0, verbose: int = 0, silent: bool = False
 ) -> None:
-    sem = asyncio.Semaphore([20, 10, 5, 2][kindness])
+    concurrency = [20, 10, 5, 2][kindness]
+    pending = iter(to_check)
 
-    async def with_sem(coroutine):
-        async with sem:
-            return await coroutine
+    async def worker(client, progress):
+        # Workers share the same iterator: as the event loop is single
+        # threaded, each domain is picked by exactly one of them.
+        for domain in pending:
+            await check_domain(domain, client)
+            progress.update()
 
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=20)) as client:
-        gather = asyncio.gather if (verbose or silent) else tqdm.gather
-        await gather(*[with_sem(check_domain(domain, client)) for domain in to_check])
+    try:
+        # Fail on dead nameservers well within the 20s total timeout.
+        resolver = aiohttp.AsyncResolver(timeout=3, tries=2)
+    except RuntimeError:  # aiodns is not installed.
+        resolver = aiohttp.ThreadedResolver()
+    # One connection per worker, so none waits for a free one.
+    connector = aiohttp.TCPConnector(limit=concurrency, resolver=resolver)
+    # Unresponsive hosts fail after 5s instead of the full 20s.
+    timeout = aiohttp.ClientTimeout(total=20, sock_connect=5, sock_read=10)
+    # Cookies are kept: some sites redirect to themselves to set one.
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as client:
+        with tqdm(total=len(to_check), disable=bool(verbose or silent)) as progress:
+            async with asyncio.TaskGroup() as workers:
+                for _ in range(min(concurrency, len(to_check))):
+                    workers.create_task(worker(client, progress))
+    await resolver.close()
 
     await asyncio.sleep(
         0.5  # See https://docs.aiohttp.org/en/stable/client_advanced.html#graceful-shutdown
@@ -209,22 +264,23 @@ def filter_domains(
         domains: set[Domain], limit: int, grep: list[str], partial: tuple[int, int], new: bool
 ) -> list[Domain]:
     """Filter domains according to --limit and --grep command line args."""
+    # Chained generators: with --limit, filtering stops as soon as enough
+    # domains are found, without building any intermediate list.
     if new:
-        domains = [domain for domain in domains if not domain.http_status]
+        domains = (domain for domain in domains if not domain.http_status)
     if grep:
-        domains = [
-            domain
-            for domain in domains
-            if any(pattern in domain.name for pattern in grep)
-        ]
+        patterns = re.compile("|".join(map(re.escape, grep)))
+        domains = (domain for domain in domains if patterns.search(domain.name))
     if partial != (1, 1):
         bucket_id, bucket_count = partial
-        domains = [
+        domains = (
             domain
             for domain in domains
             if crc32(domain.name.encode("UTF-8")) % bucket_count == bucket_id - 1
-        ]
-    return list(domains)[:limit]
+        )
+    # Deliberately not sorted: sibling subdomains are often served by the
+    # same organisation, the set order spreads the load across them.
+    return list(islice(domains, limit))
 
 
 def main():
@@ -235,14 +291,17 @@ def main():
     domains = parse_csv_file(args.file)
     to_check = filter_domains(domains, args.limit, args.grep, args.partial, args.new)
     try:
-        asyncio.run(rescan_domains(to_check, args.kindness, args.verbose, args.silent))
+        run(rescan_domains(to_check, args.kindness, args.verbose, args.silent))
     except KeyboardInterrupt:
         logging.info("Interrupted by keyboard, saving before exiting…")
 
     write_csv_file(args.file, domains)
 
     # Refresh .txt from .csv, it's fast:
-    domains_csv_to_urls_txt.main()
+    if args.file.resolve() == ROOT / "domains.csv":
+        domains_csv_to_urls_txt.write_urls_txt(domains)
+    else:
+        domains_csv_to_urls_txt.main()
 
 
 if __name__ == "__main__":
@@ -15,19 +15,25 @@ FILE = ROOT / "domains.csv"
 
 
 def main():
-    lines = requests.get(
-        "https://www.data.gouv.fr/fr/datasets/r/24848dc0-e16c-4ce8-94d9-24bc6304c9b6"
-    ).text
     domains = parse_csv_file(FILE)
-    for line in lines.splitlines():
-        domain = Domain(
-            line,
-            script=Path(__file__).name,
-            type="Gouvernement" if line.endswith(".gouv.fr") else "",
-        )
-        if domain not in domains:
-            domains.add(domain)
-    write_csv_file(FILE, sorted(domains))
+    known_names = {domain.name for domain in domains}
+    with requests.get(
+        "https://www.data.gouv.fr/fr/datasets/r/24848dc0-e16c-4ce8-94d9-24bc6304c9b6",
+        stream=True,
+    ) as response:
+        response.encoding = response.encoding or "UTF-8"
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or line in known_names:
+                continue
+            known_names.add(line)
+            domains.add(
+                Domain(
+                    line,
+                    script=Path(__file__).name,
+                    type="Gouvernement" if line.endswith(".gouv.fr") else "",
+                )
+            )
+    write_csv_file(FILE, domains)
 
 
 if __name__ == "__main__":
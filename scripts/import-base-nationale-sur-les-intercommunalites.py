@@ -55,27 +55,25 @@ def main():
         encoding="latin1",
         sep="\t",
         index_col=False,
+        usecols=["Nature juridique", "Site internet"],  # Don't parse the others.
     )
 
     domains = parse_csv_file(ROOT / "domains.csv")
+    known_names = {domain.name for domain in domains}
     for line in (
-            df[df["Nature juridique"] == args.nature_juridique]["Site internet"]
+            df.loc[df["Nature juridique"] == args.nature_juridique, "Site internet"]
                     .dropna()
                     .unique()
     ):
         line = line.strip().replace("http://", "").replace("https://", "")
         line = line.split("/", maxsplit=2)[0]  # Drop the path part.
-        if not line:
+        if not line or line in known_names:
             continue
         if not validators.domain(line):
             continue
-        domain = Domain(
-            line,
-            script=Path(__file__).name,
-        )
-        if domain not in domains:
-            domains.add(domain)
-    write_csv_file(ROOT / "domains.csv", sorted(domains))
+        known_names.add(line)
+        domains.add(Domain(line, script=Path(__file__).name))
+    write_csv_file(ROOT / "domains.csv", domains)
 
 
 if __name__ == "__main__":
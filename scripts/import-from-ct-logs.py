@@ -19,7 +19,7 @@ from pathlib import Path
 
 import psycopg2
 
-from public_domain import Domain, NON_PUBLIC_DOMAINS, parse_csv_file, write_csv_file
+from public_domain import Domain, parse_csv_file, write_csv_file
 
 ROOT = Path(__file__).resolve().parent.parent
 FILE = ROOT / "domains.csv"
@@ -28,32 +28,41 @@ FILE = ROOT / "domains.csv"
 def query_ct_logs(last_id):
     """Query crt.sh using their postgres public API."""
     conn = psycopg2.connect(dbname="certwatch", user="guest", host="crt.sh")
-    conn.set_session(readonly=True, autocommit=True)
-    cur = conn.cursor()
+    # A named cursor streams the rows (itersize at a time) instead of
+    # loading them all, but it needs a transaction: no autocommit.
+    conn.set_session(readonly=True)
+    cur = conn.cursor(name="ct_logs")
+    cur.itersize = 10_000
     cur.execute(
-        """SELECT id, altnames.*, x509_subjectname(certificate) subject
-    FROM certificate, LATERAL (SELECT * FROM x509_altnames(certificate)) altnames
-    WHERE plainto_tsquery('gouv.fr') @@ identities(certificate) AND id > %s""",
+        # Certificates matching gouv.fr also list other names, they are
+        # discarded by the server instead of being sent to us:
+        """SELECT id, altname
+    FROM certificate, LATERAL (SELECT * FROM x509_altnames(certificate)) altnames(altname)
+    WHERE plainto_tsquery('gouv.fr') @@ identities(certificate) AND id > %s
+      AND altname ILIKE '%%.gouv.fr'""",
         (last_id,),
     )
 
     domains = parse_csv_file(FILE)
+    # Certificates list the same names over and over: membership is
+    # checked on plain names, Domain objects are only built for new ones.
+    known_names = {domain.name for domain in domains}
     primary_key = None
-    results = cur.fetchall()
-    for primary_key, domain, subject in results:
-        domain = Domain(
-            domain.lower(),
-            script=Path(__file__).name,
-            sources=f"https://crt.sh/?id={primary_key}",
-        )
-        if domain.name.startswith("*."):
-            domain.name = domain.name[2:]
-        if not domain.name.endswith(".gouv.fr"):
+    for primary_key, name in cur:
+        name = name.lower().removeprefix("*.")
+        if not name.endswith(".gouv.fr") or name in known_names:
             continue
-        domain.type = "Gouvernement"
-        if domain not in domains:
-            domains.add(domain)
-    write_csv_file(FILE, sorted(domains))
+        known_names.add(name)
+        domains.add(
+            Domain(
+                name,
+                script=Path(__file__).name,
+                sources=f"https://crt.sh/?id={primary_key}",
+                type="Gouvernement",
+            )
+        )
+    conn.close()
+    write_csv_file(FILE, domains)
     return primary_key
 
 
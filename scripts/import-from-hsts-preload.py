@@ -19,20 +19,24 @@ def fetch_hsts_preload():
     preload_list = b64decode(preload_list).decode()
     preload_list = re.sub("//.*", "", preload_list, flags=re.M)
     preload_list = json.loads(preload_list)
-    domains = [entry["name"] for entry in preload_list["entries"]]
-    gouv_fr_domains = {
+    gouv_fr_names = {
+        entry["name"].lower()
+        for entry in preload_list["entries"]
+        if entry["name"].endswith(".gouv.fr")
+    }
+    domains = parse_csv_file(FILE)
+    # Diffing plain names, Domain objects are only built for new ones.
+    new_names = gouv_fr_names - {domain.name for domain in domains}
+    domains |= {
         Domain(
-            domain.lower(),
+            name,
             script=Path(__file__).name,
             sources="HSTS preload",
             type="Gouvernement",
         )
-        for domain in domains
-        if domain.endswith(".gouv.fr")
+        for name in new_names
     }
-    domains = parse_csv_file(FILE)
-    domains |= gouv_fr_domains
-    write_csv_file(FILE, sorted(domains))
+    write_csv_file(FILE, domains)
 
 
 def main():
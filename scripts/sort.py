@@ -8,8 +8,7 @@ from public_domain import parse_csv_file, write_csv_file
 def main():
     file = Path("domains.csv")
     domains = parse_csv_file(file)
-    domains = sorted(domains)
-    write_csv_file(file, domains)
+    write_csv_file(file, domains)  # Which sorts them.
 
 
 if __name__ == "__main__":